@@ -1,13 +1,17 @@
 import re
 import asyncio
+import time
 import traceback
-import base64
 import json
+from binascii import b2a_base64
+from collections import OrderedDict
 from typing import Optional, List, Dict, Tuple
-from urllib.parse import urlparse, quote, parse_qs
+from urllib.parse import urlparse, quote, parse_qsl, urlencode
 
 import aiohttp
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+from lxml import html as lxml_html
 
 # 尝试导入 Playwright 截图组件
 try:
@@ -16,11 +20,219 @@ try:
 except ImportError:
     HAS_PLAYWRIGHT = False
 
+# 尝试导入 orjson（可直接消费 bytes 的高速 JSON 解析器），不可用时回退标准 json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 尝试导入 google-re2（线性时间 DFA 引擎，长消息扫描不会回溯爆炸），不可用时回退标准 re
+try:
+    import re2 as _re2
+    HAS_RE2 = True
+except ImportError:
+    HAS_RE2 = False
+
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 from astrbot.api.provider import ProviderRequest
 
+# URL 匹配正则（模块加载时编译一次）
+# re.ASCII 把 \w 等类收窄为 ASCII：URL 本就不含原生 CJK，类更小匹配更快，
+# 还能避免把链接后紧跟的中文吞进结果里
+_URL_PATTERN = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/\w\.-]*\??[\w=&%\.-]*'
+URL_RE = _re2.compile(_URL_PATTERN) if HAS_RE2 else re.compile(_URL_PATTERN, re.ASCII)
+
+# 域名后缀 → Cookie 配置键（按 netloc 后缀精确匹配，避免误判 URL 路径里的子串）
+_COOKIE_SUFFIX_MAP = {
+    "xiaohongshu.com": "xiaohongshu",
+    "zhihu.com": "zhihu",
+    "weibo.com": "weibo",
+    "bilibili.com": "bilibili",
+    "douyin.com": "douyin",
+    "tieba.baidu.com": "tieba",
+    "lofter.com": "lofter",
+}
+
+# 基础请求头模板（UA 为运行时配置，按需补充）
+_BASE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+# 网易云音乐相关域名
+_MUSIC_HOSTS = frozenset({"music.163.com", "163cn.tv", "163.fm", "y.music.163.com"})
+
+# 网易云歌词 API 地址模板
+_NETEASE_LYRIC_API = "https://music.163.com/api/song/lyric?id={}&lv=-1&tv=-1"
+
+# 走 Playwright 截图解析的社交平台域名
+_SOCIAL_SUFFIXES = frozenset({
+    "xiaohongshu.com", "zhihu.com", "weibo.com",
+    "bilibili.com", "douyin.com", "lofter.com",
+})
+
+
+# LRC 时间轴标记，如 [01:23.45]
+_LRC_TS_RE = re.compile(r'\[\d+:\d+\.\d+\]')
+
+# 汉字检测（正则引擎 C 级扫描，首个命中即返回）
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+
+# 网易云链接中的歌曲 ID（query 形式与路径形式合并为单次扫描）
+# [?&] 锚定防止 userid= 之类的参数被误认成歌曲 ID
+_NETEASE_ID_RE = re.compile(r'(?:[?&]id=|/song/)(\d+)')
+
+# 页面标题中的站点后缀 / 括号注记 / 非中英文字符（用于提炼搜索关键词）
+# 交替分支用有界重复代替 .*，恶意超长标题不会引发回溯放大
+_TITLE_SUFFIX_RE = re.compile(r'(?: - 网易云音乐| - 单曲| - 专辑| - 歌曲[^|]{0,64}|\|[^|]{0,200})$')
+_PAREN_RE = re.compile(r'[（《\(【].*?[）》\)】]')
+_NON_WORD_RE = re.compile(r'[^\w\u4e00-\u9fff]')
+
+# 小红书正文容器的 class 特征
+_XHS_CONTENT_XPATH = ("//*[contains(@class,'note-content') or contains(@class,'desc')"
+                      " or contains(@class,'text')]")
+
+# 社交页面正文就绪的选择器（命中任一即可截图，不必等待 networkidle）
+_SOCIAL_READY_SELECTOR = '[class*="note-content"], [class*="desc"], [class*="note-text"], article'
+
+# 小红书正文容器的 CSS 形式（供页内提取脚本使用，语义与上面的 XPath 一致）
+_XHS_CONTENT_SELECTOR = '[class*="note-content"], [class*="desc"], [class*="text"]'
+
+# 页内正文提取脚本：浏览器手里已有现成 DOM，直接取 innerText，
+# 省去 page.content() 序列化整页 HTML 再交给 lxml 重新解析的一来一回
+_PAGE_TEXT_JS = """(selector) => {
+    document.querySelectorAll('script,style,nav,footer,header,aside,iframe')
+        .forEach(el => el.remove());
+    const root = (selector && document.querySelector(selector)) || document.body;
+    return root ? root.innerText : '';
+}"""
+
+# 单条消息最多解析的链接数
+_MAX_URLS_PER_MSG = 3
+
+# 不影响页面内容的跟踪参数，归一化缓存键时剔除
+_TRACKING_PARAMS = frozenset({
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+    'spm', 'from', 'share_token', 'share_source', 'share_medium', 'share_plat',
+    'share_session_id', 'share_tag', 'unique_k', 'vd_source',
+})
+
+
+def _canonicalize_url(url: str) -> str:
+    """归一化缓存键：域名小写、剔除跟踪参数；网易云链接按歌曲 ID 归并"""
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if _match_suffix(netloc, _MUSIC_HOSTS):
+        id_match = _NETEASE_ID_RE.search(url)
+        if id_match:
+            return f"netease:{id_match.group(1)}"
+    kept = [(k, v) for k, v in parse_qsl(parsed.query) if k not in _TRACKING_PARAMS]
+    query = urlencode(kept) if kept else ''
+    key = f"{parsed.scheme}://{netloc}{parsed.path}" + (f"?{query}" if query else "")
+    if parsed.fragment:  # fragment 路由的单页应用靠它区分页面，不能丢
+        key += f"#{parsed.fragment}"
+    return key
+
+# 截图/取文都用不到的重资源类型（样式保留，避免截图排版崩坏）
+_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+
+
+async def _block_heavy_resources(route):
+    """Playwright 路由回调：拦截图片/音视频/字体请求"""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+# 含这些关键词的行即使形似元数据也保留（单次交替扫描代替逐词 in）
+_LYRIC_KEEP_RE = re.compile('|'.join(map(re.escape, ("歌词", "Lyric", "LRC"))))
+
+# 正文黑名单关键词（备案号/版权声明/APP 引流等页脚噪声）
+_TEXT_BLACKLIST = ("沪ICP备", "公网安备", "经营许可证", "版权所有", "©", "Copyright", "下载APP", "打开APP")
+_BLACKLIST_RE = re.compile('|'.join(map(re.escape, _TEXT_BLACKLIST)))
+
+# 尝试用 pyahocorasick 构建多模式匹配自动机（整行单遍扫描），不可用时回退交替正则
+try:
+    import ahocorasick
+    _BLACKLIST_AC = ahocorasick.Automaton()
+    for _kw in _TEXT_BLACKLIST:
+        _BLACKLIST_AC.add_word(_kw, _kw)
+    _BLACKLIST_AC.make_automaton()
+except ImportError:
+    _BLACKLIST_AC = None
+
+
+def _hits_blacklist(line: str) -> bool:
+    """判断行内是否命中任一黑名单关键词"""
+    if _BLACKLIST_AC is not None:
+        return next(_BLACKLIST_AC.iter(line), None) is not None
+    return _BLACKLIST_RE.search(line) is not None
+
+# 正文无关的噪声标签，解析后一次性清除
+_STRIP_TAGS = ('script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe')
+
+# 小江音乐网各页面实际需要的节点，解析期即丢弃其余 DOM
+_TITLE_STRAINER = SoupStrainer('title')
+_LYRIC_PAGE_STRAINER = SoupStrainer(['article', 'div'])
+
+# 搜索结果页只取第一个 song-link 的 href（class 词边界精确匹配）
+_SONG_LINK_XPATH = '//a[contains(concat(" ", normalize-space(@class), " "), " song-link ")]/@href'
+
+# 复用的 lxml 解析器：跳过注释/处理指令收集与 id 索引。
+# 插件只在单个事件循环线程里解析，共享实例无需加锁。
+_LXML_PARSER = lxml_html.HTMLParser(remove_comments=True, remove_pis=True, collect_ids=False)
+
+
+# 正文最多读取的响应体积；再大的页面截断后也只剩 max_length 字
+_MAX_HTML_BYTES = 512 * 1024
+
+
+async def _read_capped(resp, limit: int = _MAX_HTML_BYTES) -> bytes:
+    """分块读取响应体，够 limit 即停，不为将被丢弃的内容付解码/解析成本"""
+    chunks = []
+    total = 0
+    async for chunk in resp.content.iter_chunked(16384):
+        chunks.append(chunk)
+        total += len(chunk)
+        if total >= limit:
+            break
+    return b''.join(chunks)
+
+
+def _extract_text_lxml(html, xpath: Optional[str] = None, encoding: Optional[str] = None) -> str:
+    """lxml 直取正文文本，绕过 BeautifulSoup 的 Python 包装层
+
+    接受 str 或 bytes；bytes 配合 encoding（HTTP 头声明的 charset）先行
+    解码——libxml2 对无页内声明的文档会回退 latin-1，仅靠响应头声明
+    UTF-8 的页面不解码就会变成乱码。未给 encoding 时交由 lxml 按页内
+    声明探测。指定 xpath 时优先取首个命中的容器，未命中则回退全文。
+    """
+    if encoding and isinstance(html, bytes):
+        html = html.decode(encoding, errors='ignore')
+    tree = lxml_html.fromstring(html, parser=_LXML_PARSER)
+    etree.strip_elements(tree, *_STRIP_TAGS, with_tail=False)
+    if xpath is not None:
+        nodes = tree.xpath(xpath)
+        if nodes:
+            tree = nodes[0]
+    return '\n'.join(t.strip() for t in tree.itertext() if t.strip())
+
+
+def _match_suffix(netloc: str, table) -> Optional[str]:
+    """在 netloc 的逐级后缀上做哈希查找（如 y.music.163.com → music.163.com → ...）"""
+    while netloc:
+        if netloc in table:
+            return netloc
+        dot = netloc.find('.')
+        if dot == -1:
+            break
+        netloc = netloc[dot + 1:]
+    return None
+
+
 @register("astrbot_plugin_link_reader", "AstrBot_Developer", "自动解析链接内容，网易云直连解析 + 社交平台截图解析。", "1.7.1")
 class LinkReaderPlugin(Star):
     def __init__(self, context: Context, config: dict):
@@ -34,28 +246,62 @@ class LinkReaderPlugin(Star):
         self.timeout = self.general_config.get("request_timeout", 15)
         self.user_agent = self.general_config.get("user_agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
         self.prompt_template = self.general_config.get("prompt_template", "\n【以下是链接的具体内容，请参考该内容进行回答】：\n{content}\n")
+        self.always_screenshot = self.general_config.get("always_screenshot", False)
 
         # 加载平台 Cookie
         self.platform_cookies = self.config.get("platform_cookies", {})
 
-        # URL 匹配正则
-        self.url_pattern = re.compile(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/\w\.-]*\??[\w=&%\.-]*')
+        # 网易云 API 请求头（内容固定，构建一次重复使用）
+        self._netease_headers = {"Referer": "https://music.163.com/", "Cookie": "os=pc", "User-Agent": self.user_agent}
+
+        # 出站请求并发上限，防止消息突发时请求无限堆积
+        self._net_sema = asyncio.Semaphore(16)
+
+        # link_status 报告缓存（配置仅在实例化时读取，插件生命周期内不会变化）
+        self._status_cache: Optional[str] = None
+
+        # 共享 Playwright/Chromium 实例（懒加载，Chromium 冷启动只付一次）
+        self._pw = None
+        self._browser = None
+        self._pw_lock = asyncio.Lock()
+
+        # 并发浏览器上下文上限，防止突发截图请求把内存打爆
+        self._ctx_sema = asyncio.Semaphore(self.general_config.get("max_browser_contexts", 3))
+
+        # 共享 HTTP 会话（懒加载，复用连接池与 DNS 缓存）
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # URL → 解析结果缓存（LRU + TTL），同一链接并发命中时合并为一次抓取
+        self._url_cache: "OrderedDict[str, Tuple[float, Tuple[Optional[str], Optional[bytes]]]]" = OrderedDict()
+        self._url_cache_ttl = 600
+        self._url_cache_max = 256
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        # song_id → 格式化歌词缓存（歌词不变，无需 TTL；同曲的不同短链都能命中）
+        self._lrc_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lrc_cache_max = 1024
+
+        # URL 匹配正则（模块级预编译，可用时走 RE2 DFA 引擎）
+        self.url_pattern = URL_RE
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """懒加载共享 HTTP 会话，免去每次请求的 TCP/TLS 握手与 DNS 查询"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=8, ttl_dns_cache=300,
+                                               use_dns_cache=True, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
 
     def _get_headers(self, domain: str = "") -> dict:
         """根据域名获取对应的 Headers (包含 Cookie)"""
-        headers = {
-            "User-Agent": self.user_agent,
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
-        }
-        cookie_key = None
-        if "xiaohongshu" in domain: cookie_key = "xiaohongshu"
-        elif "zhihu" in domain: cookie_key = "zhihu"
-        elif "weibo" in domain: cookie_key = "weibo"
-        elif "bilibili" in domain: cookie_key = "bilibili"
-        elif "douyin" in domain: cookie_key = "douyin"
-        elif "tieba.baidu" in domain: cookie_key = "tieba"
-        elif "lofter" in domain: cookie_key = "lofter"
+        headers = dict(_BASE_HEADERS)
+        headers["User-Agent"] = self.user_agent
+        suffix = _match_suffix(domain.lower(), _COOKIE_SUFFIX_MAP)
+        cookie_key = _COOKIE_SUFFIX_MAP[suffix] if suffix else None
 
         if cookie_key:
             cookie_val = self.platform_cookies.get(cookie_key, "")
@@ -63,113 +309,157 @@ class LinkReaderPlugin(Star):
                 headers["Cookie"] = cookie_val
         return headers
 
-    def _is_music_site(self, url: str) -> bool:
+    def _is_music_site(self, netloc: str) -> bool:
         """仅识别网易云音乐相关域名"""
-        music_domains = ["music.163.com", "163cn.tv", "163.fm", "y.music.163.com"]
-        return any(domain in url for domain in music_domains)
+        return _match_suffix(netloc, _MUSIC_HOSTS) is not None
 
     def _contains_chinese(self, text: str) -> bool:
         """检测文本是否包含汉字"""
-        for char in text:
-            if '\u4e00' <= char <= '\u9fff':
-                return True
-        return False
+        return _CJK_RE.search(text) is not None
 
-    def _filter_lyrics(self, lyrics: str) -> str:
-        """深度清洗逻辑，去除元数据和时间轴"""
-        if not lyrics: return ""
-        lyrics = lyrics.replace('\\n', '\n').replace('\\r', '')
-        lines = lyrics.split('\n')
-        filtered_lines = []
-        for line in lines:
+    def _iter_lyric_lines(self, lyrics: str):
+        """单遍生成清洗后的歌词行，直接供 '\\n'.join 消费（时间轴已在上游整体剔除）"""
+        for line in lyrics.split('\n'):
             line = line.strip()
-            if not line: continue
-            line = re.sub(r'\[\d+:\d+\.\d+\]', '', line).strip()
             if not line or (line.startswith('[') and line.endswith(']')): continue
-            
+
             if ((':' in line or '：' in line) and len(line) < 35) or ' - ' in line:
-                if not any(kw in line for kw in ["歌词", "Lyric", "LRC"]):
+                if not _LYRIC_KEEP_RE.search(line):
                     continue
-            
+
             if ' ' in line and self._contains_chinese(line):
                 parts = [part.strip() for part in line.split(' ') if part.strip()]
                 if all(len(part) < 20 for part in parts):
-                    filtered_lines.extend(parts)
+                    for part in parts:
+                        if len(part) > 1 and not part.isdigit():
+                            yield part
                     continue
-            
-            filtered_lines.append(line)
-        
-        final_lines = [l for l in filtered_lines if len(l) > 1 and not l.isdigit()]
-        return '\n'.join(final_lines)
+
+            if len(line) > 1 and not line.isdigit():
+                yield line
+
+    def _filter_lyrics(self, lyrics: str) -> str:
+        """深度清洗逻辑，去除元数据和时间轴"""
+        if not lyrics: return ""
+        # 体积护栏：正常 LRC 远小于此，异常超大输入直接截断，不让清洗阻塞事件循环
+        if len(lyrics) > 200_000:
+            lyrics = lyrics[:200_000]
+        lyrics = lyrics.replace('\\n', '\n').replace('\\r', '')
+        # 对整段歌词做一次时间轴剔除，代替逐行调用正则
+        lyrics = _LRC_TS_RE.sub('', lyrics)
+        return '\n'.join(self._iter_lyric_lines(lyrics))
+
+    def _smart_truncate(self, text: str, limit: int) -> str:
+        """在 limit 附近的换行处截断，避免句子被拦腰切断"""
+        if len(text) <= limit:
+            return text
+        cut = text.rfind('\n', 0, limit)
+        if cut < limit // 2:  # 找不到合适的换行时退回硬截断
+            cut = limit
+        return text[:cut] + "...(内容过长已截断)"
 
     def _clean_text(self, text: str) -> str:
-        """网页正文清洗"""
-        lines = text.split('\n')
-        blacklist = ["沪ICP备", "公网安备", "经营许可证", "版权所有", "©", "Copyright", "下载APP", "打开APP"]
+        """网页正文清洗（单遍处理，凑够截断长度即提前收工）"""
         cleaned_lines = []
-        for line in lines:
-            line = line.strip()
-            if not line or len(line) < 2 or any(kw in line for kw in blacklist):
+        total = 0
+        for line in map(str.strip, text.split('\n')):
+            if len(line) < 2 or _hits_blacklist(line):
                 continue
             cleaned_lines.append(line)
-        result = '\n'.join(cleaned_lines)
-        if len(result) > self.max_length:
-            result = result[:self.max_length] + "...(内容过长已截断)"
-        return result
+            total += len(line) + 1
+            if total > self.max_length:  # 后续行横竖会被截掉，不再清洗
+                break
+        return self._smart_truncate('\n'.join(cleaned_lines), self.max_length)
 
-    async def _handle_music_direct_api(self, url: str) -> str:
-        """网易云音乐直连解析"""
+    async def _handle_music_direct_api(self, url: str) -> Tuple[str, bool]:
+        """网易云音乐直连解析，返回 (文本, 是否解析成功)"""
         try:
-            async with aiohttp.ClientSession() as session:
-                final_url = url
-                if any(domain in url for domain in ["163cn.tv", "163.fm"]):
+            session = await self._get_session()
+            final_url = url
+            if any(domain in url for domain in ["163cn.tv", "163.fm"]):
+                async with self._net_sema:
                     async with session.head(url, allow_redirects=True, timeout=8) as resp:
                         final_url = str(resp.url)
 
-                id_match = re.search(r'id=(\d+)', final_url) or re.search(r'song/(\d+)', final_url)
-                if id_match:
-                    song_id = id_match.group(1)
-                    api_url = f"https://music.163.com/api/song/lyric?id={song_id}&lv=-1&tv=-1"
-                    headers = {"Referer": "https://music.163.com/", "Cookie": "os=pc", "User-Agent": self.user_agent}
-                    async with session.get(api_url, headers=headers) as resp:
-                        text = await resp.text()
-                        data = json.loads(text)
-                        lrc = data.get("lrc", {}).get("lyric", "")
-                        tlrc = data.get("tlyric", {}).get("lyric", "")
-                        if lrc:
-                            res = f"【网易云解析 (ID: {song_id})】\n\n{self._filter_lyrics(lrc)}"
-                            if tlrc: res += f"\n\n【翻译】\n{self._filter_lyrics(tlrc)}"
-                            return res
-
-                return await self._fallback_xiaojiang_search(final_url)
+            id_match = _NETEASE_ID_RE.search(final_url)
+            if id_match:
+                song_id = id_match.group(1)
+                # API 直连与搜索兜底并行起跑：直连命中即取消兜底，失手时兜底已在途
+                task_lrc = asyncio.create_task(self._fetch_netease_lyric(session, song_id))
+                task_fallback = asyncio.create_task(self._fallback_xiaojiang_search(final_url))
+                try:
+                    res = await task_lrc
+                except Exception as e:
+                    logger.error(f"[LinkReader] 网易云 API 异常: {e}")
+                    res = None
+                if res:
+                    task_fallback.cancel()
+                    return res, True
+                return await task_fallback
+
+            return await self._fallback_xiaojiang_search(final_url)
 
         except Exception as e:
             logger.error(f"[LinkReader] 网易云 API 异常: {e}")
             return await self._fallback_xiaojiang_search(url)
 
-    async def _fallback_xiaojiang_search(self, url: str) -> str:
-        """通用歌词搜索兜底"""
+    async def _fetch_netease_lyric(self, session: aiohttp.ClientSession, song_id: str) -> Optional[str]:
+        """调用网易云歌词 API，命中则返回格式化歌词"""
+        cached = self._lrc_cache.get(song_id)
+        if cached is not None:
+            self._lrc_cache.move_to_end(song_id)
+            return cached
+
+        api_url = _NETEASE_LYRIC_API.format(song_id)
+        async with self._net_sema:
+            async with session.get(api_url, headers=self._netease_headers, timeout=self.timeout) as resp:
+                data = _json_loads(await resp.read())
+        lrc = data.get("lrc", {}).get("lyric", "")
+        tlrc = data.get("tlyric", {}).get("lyric", "")
+        if not lrc:
+            return None
+        if tlrc:
+            # 原文与翻译两次清洗互不依赖，丢线程池并行跑，也不占事件循环
+            lrc_clean, tlrc_clean = await asyncio.gather(
+                asyncio.to_thread(self._filter_lyrics, lrc),
+                asyncio.to_thread(self._filter_lyrics, tlrc))
+        else:
+            lrc_clean, tlrc_clean = self._filter_lyrics(lrc), ""
+        res = f"【网易云解析 (ID: {song_id})】\n\n{lrc_clean}"
+        if tlrc: res += f"\n\n【翻译】\n{tlrc_clean}"
+
+        self._lrc_cache[song_id] = res
+        while len(self._lrc_cache) > self._lrc_cache_max:
+            self._lrc_cache.popitem(last=False)
+        return res
+
+    async def _fallback_xiaojiang_search(self, url: str) -> Tuple[str, bool]:
+        """通用歌词搜索兜底，返回 (文本, 是否解析成功)"""
         try:
-            async with aiohttp.ClientSession() as session:
+            session = await self._get_session()
+            async with self._net_sema:
                 async with session.get(url, headers={"User-Agent": self.user_agent}, timeout=8) as resp:
-                    soup = BeautifulSoup(await resp.text(errors='ignore'), 'lxml')
-                    title = soup.title.string.strip() if soup.title else "未知歌曲"
+                    # <title> 一定在页面开头，64KB 足够
+                    raw = await _read_capped(resp, 64 * 1024)
+                    soup = BeautifulSoup(raw.decode(resp.charset or 'utf-8', errors='ignore'), 'lxml', parse_only=_TITLE_STRAINER)
+                    title = soup.title.string.strip() if soup.title and soup.title.string else "未知歌曲"
             
-            song_name = re.sub(r'( - 网易云音乐|\|.*| - 歌曲.*| - 单曲| - 专辑)$', '', title).strip()
-            clean_name = re.sub(r'[（《\(【].*?[）》\)】]', '', song_name).strip()
+            song_name = _TITLE_SUFFIX_RE.sub('', title).strip()
+            clean_name = _PAREN_RE.sub('', song_name).strip()
             
-            if ' - ' in clean_name:
-                parts = clean_name.split(' - ')
-                clean_name = parts[0].strip() if len(parts[0].strip()) > 1 else parts[1].strip()
+            head, sep, tail = clean_name.partition(' - ')
+            if sep:
+                head = head.strip()
+                clean_name = head if len(head) > 1 else tail.partition(' - ')[0].strip()
             
-            final_keyword = clean_name if len(re.sub(r'[^\w\u4e00-\u9fff]', '', clean_name)) >= 1 else song_name
+            final_keyword = clean_name if len(_NON_WORD_RE.sub('', clean_name)) >= 1 else song_name
 
             content = await self._search_xiaojiang(final_keyword)
             if content:
-                return f"【歌词解析: {final_keyword}】\n来源: 小江音乐网\n\n{content}"
-            return f"识别到音乐链接，但在搜索《{final_keyword}》时未能匹配到歌词。"
+                return f"【歌词解析: {final_keyword}】\n来源: 小江音乐网\n\n{content}", True
+            return f"识别到音乐链接，但在搜索《{final_keyword}》时未能匹配到歌词。", False
         except Exception:
-            return "音乐链接解析失败。"
+            return "音乐链接解析失败。", False
 
     async def _search_xiaojiang(self, song_name: str) -> Optional[str]:
         """小江音乐网搜索逻辑"""
@@ -177,86 +467,226 @@ class LinkReaderPlugin(Star):
         base_domain = "https://xiaojiangclub.com"
         headers = {"User-Agent": self.user_agent}
         try:
-            async with aiohttp.ClientSession() as session:
+            session = await self._get_session()
+            async with self._net_sema:
                 async with session.get(search_url, headers=headers, timeout=10) as resp:
                     if resp.status != 200: return None
-                    soup = BeautifulSoup(await resp.text(), 'lxml')
-                    target_link_tag = soup.find('a', class_='song-link', href=True)
-                    if not target_link_tag: return None
-                    
-                    target_link = target_link_tag['href'] if target_link_tag['href'].startswith("http") else base_domain + target_link_tag['href']
-                    
-                    async with session.get(target_link, headers=headers, timeout=10) as l_resp:
-                        l_soup = BeautifulSoup(await l_resp.text(), 'lxml')
-                        container = l_soup.find('div', class_='entry-content') or l_soup.find('article')
-                        if not container: container = l_soup
-                        for tag in container(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']): tag.decompose()
-                        return self._filter_lyrics(container.get_text(separator='\n', strip=True))
-        except: pass
+                    raw = await _read_capped(resp)
+                    # 空白响应体会让 fromstring 抛 ParserError，绕过下面收窄后的 except
+                    if not raw.strip(): return None
+                    tree = lxml_html.fromstring(raw, parser=_LXML_PARSER)
+                    hrefs = tree.xpath(_SONG_LINK_XPATH)
+                    if not hrefs: return None
+
+                    target_link = hrefs[0] if hrefs[0].startswith("http") else base_domain + hrefs[0]
+
+                async with session.get(target_link, headers=headers, timeout=10) as l_resp:
+                    l_soup = BeautifulSoup(await l_resp.text(), 'lxml', parse_only=_LYRIC_PAGE_STRAINER)
+                    container = l_soup.find('div', class_='entry-content') or l_soup.find('article')
+                    if not container: container = l_soup
+                    # extract 只做摘除，不递归销毁子树，取文前清场足够
+                    for tag in container(_STRIP_TAGS): tag.extract()
+                    return self._filter_lyrics(container.get_text(separator='\n', strip=True))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"[LinkReader] 小江音乐网搜索失败: {e}")
         return None
 
-    async def _get_screenshot_and_content(self, url: str):
+    async def _get_browser(self):
+        """懒加载共享 Chromium 实例，浏览器崩溃断连时自动重建"""
+        async with self._pw_lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._pw is None:
+                    self._pw = await async_playwright().start()
+                self._browser = await self._pw.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
+                )
+            return self._browser
+
+    async def _get_screenshot_and_content(self, url: str, need_screenshot: bool = True,
+                                          content_selector: Optional[str] = None):
         """Playwright 浏览器自动化截图"""
         if not HAS_PLAYWRIGHT: return None, None
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(user_agent=self.user_agent, viewport={'width': 1280, 'height': 800})
-                page = await context.new_page()
-                await page.goto(url, wait_until='networkidle', timeout=30000)
-                content = await page.content()
-                screenshot_bytes = await page.screenshot(type='jpeg', quality=80)
-                screenshot_base64 = base64.b64encode(screenshot_bytes).decode('utf-8')
-                await browser.close()
-                return content, screenshot_base64
+            async with self._ctx_sema:
+                return await self._screenshot_with_context(url, need_screenshot, content_selector)
         except Exception as e:
             logger.error(f"[LinkReader] 截图失败: {e}")
             return None, None
 
+    async def _screenshot_with_context(self, url: str, need_screenshot: bool = True,
+                                       content_selector: Optional[str] = None):
+        """在独立 BrowserContext 中加载页面，页内提取并清洗正文，按需截图"""
+        browser = await self._get_browser()
+        context = await browser.new_context(user_agent=self.user_agent, viewport={'width': 1280, 'height': 800})
+        try:
+            await context.route('**/*', _block_heavy_resources)
+            page = await context.new_page()
+            # networkidle 会被打点/心跳请求拖住几秒，DOM 就绪 + 正文选择器出现即可开工
+            await page.goto(url, wait_until='domcontentloaded', timeout=15000)
+            try:
+                await page.wait_for_selector(_SOCIAL_READY_SELECTOR, timeout=6000)
+            except Exception:
+                pass  # 选择器未出现就按当前页面状态截取
+            # 先截图再跑提取脚本：脚本会摘掉导航/页脚，截图要保留页面原貌
+            screenshot_bytes = await page.screenshot(type='jpeg', quality=60) if need_screenshot else None
+            text = await page.evaluate(_PAGE_TEXT_JS, content_selector)
+            content = self._clean_text(text) if text else ""
+            if screenshot_bytes is None and not content:
+                # 正文榨不出来（JS 墙）时就地补截图交视觉模型兜底，不再整页重开；
+                # 此时页面本就没什么正文，脚本摘掉的导航不影响截图价值
+                screenshot_bytes = await page.screenshot(type='jpeg', quality=60)
+            return content, screenshot_bytes
+        finally:
+            await context.close()
+
     async def _fetch_url_content(self, url: str):
-        """主入口：区分网易云、社交平台、常规网页"""
-        if self._is_music_site(url):
-            return await self._handle_music_direct_api(url), None
-        
-        domain = urlparse(url).netloc
-        social_platforms = ["xiaohongshu.com", "zhihu.com", "weibo.com", "bilibili.com", "douyin.com", "lofter.com"]
-        
+        """带缓存入口：重复链接直接命中，同链接并发请求合并为一次抓取"""
+        key = _canonicalize_url(url)
+        now = time.monotonic()
+        cached = self._url_cache.get(key)
+        if cached and now - cached[0] < self._url_cache_ttl:
+            self._url_cache.move_to_end(key)
+            self._cache_hits += 1
+            return cached[1]
+        self._cache_misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_url_content_uncached(url))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+
+        content, screenshot, ok = await asyncio.shield(task)
+        if ok and content:  # 失败结果（含错误文案）不进缓存，下次重试
+            self._url_cache[key] = (now, (content, screenshot))
+            self._url_cache.move_to_end(key)
+            while len(self._url_cache) > self._url_cache_max:
+                self._url_cache.popitem(last=False)
+        return content, screenshot
+
+    async def _try_static_fetch(self, url: str, headers: dict) -> Optional[str]:
+        """社交平台轻量试探：能静态抓到成型的 HTML 就返回（已按响应头解码），
+        否则交回浏览器渲染
+
+        判断标准较保守：体量够大且段落标签数正常才认为是服务端直出页面，
+        纯 JS 骨架（小红书游客态等）会在这里被筛掉。
+        """
+        try:
+            session = await self._get_session()
+            async with self._net_sema:
+                async with session.get(url, headers=headers, timeout=8, ssl=False) as resp:
+                    if resp.status != 200:
+                        return None
+                    body = await _read_capped(resp)
+                    charset = resp.charset or 'utf-8'
+        except Exception:
+            return None
+        html = body.decode(charset, errors='ignore')
+        # '<p>' 与 '<p ' 才是段落；裸 '<p' 会把 <path>/<pre>/<picture> 也算进来
+        if len(html) > 4096 and html.count('<p>') + html.count('<p ') > 3:
+            return html
+        return None
+
+    async def _fetch_url_content_uncached(self, url: str):
+        """主入口：区分网易云、社交平台、常规网页（netloc 只解析一次）
+
+        返回 (文本, 截图, 是否成功)：失败时文本仍是面向用户的错误说明，
+        但 ok=False 保证它不会被当成正常结果写进缓存。
+        """
+        netloc = urlparse(url).netloc.lower()
+        if self._is_music_site(netloc):
+            content, ok = await self._handle_music_direct_api(url)
+            return content, None, ok
+
         # 社交平台截图解析
-        if any(sp in domain for sp in social_platforms) and HAS_PLAYWRIGHT:
-            html, screenshot = await self._get_screenshot_and_content(url)
-            if html:
-                soup = BeautifulSoup(html, 'lxml')
-                for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']): tag.decompose()
-                if "xiaohongshu.com" in url:
-                    content_div = soup.find(class_=re.compile(r'desc|note-content|text'))
-                    content = content_div.get_text(separator='\n', strip=True) if content_div else soup.get_text(separator='\n', strip=True)
-                else:
-                    content = soup.get_text(separator='\n', strip=True)
-                return self._clean_text(content), screenshot
+        if _match_suffix(netloc, _SOCIAL_SUFFIXES) and HAS_PLAYWRIGHT:
+            # 不强制截图时先试静态抓取：服务端直出的页面不必付起浏览器的成本
+            if not self.always_screenshot:
+                body = await self._try_static_fetch(url, self._get_headers(netloc))
+                if body is not None:
+                    xpath = _XHS_CONTENT_XPATH if netloc.endswith("xiaohongshu.com") else None
+                    content = self._clean_text(_extract_text_lxml(body, xpath))
+                    if content:
+                        return content, None, True
+            selector = _XHS_CONTENT_SELECTOR if netloc.endswith("xiaohongshu.com") else None
+            # 正文清洗与兜底截图都在页面上下文内完成，失败（None, None）才落到常规抓取
+            content, screenshot = await self._get_screenshot_and_content(
+                url, need_screenshot=self.always_screenshot, content_selector=selector)
+            if content or screenshot is not None:
+                return content, screenshot, True
 
         # 常规网页抓取
-        headers = self._get_headers(domain)
+        headers = self._get_headers(netloc)
         try:
-            async with aiohttp.ClientSession() as session:
+            session = await self._get_session()
+            async with self._net_sema:
                 async with session.get(url, headers=headers, timeout=10, ssl=False) as resp:
-                    soup = BeautifulSoup(await resp.text(errors='ignore'), 'lxml')
-                    for tag in soup(['script', 'style', 'nav', 'footer', 'header']): tag.decompose()
-                    return self._clean_text(soup.get_text(separator='\n', strip=True)), None
+                    content = _extract_text_lxml(await _read_capped(resp),
+                                                 encoding=resp.charset or 'utf-8')
+                return self._clean_text(content), None, True
         except Exception as e:
-            return f"网页解析出错: {str(e)}", None
+            return f"网页解析出错: {str(e)}", None, False
+
+    async def terminate(self):
+        """插件卸载时释放共享浏览器与 HTTP 会话资源"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            self._session = None
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._pw:
+            try:
+                await self._pw.stop()
+            except Exception:
+                pass
+            self._pw = None
+
+    @staticmethod
+    async def _encode_screenshot(screenshot: bytes) -> str:
+        """截图转 base64，大图丢线程池编码，避免长时间占住事件循环"""
+        if len(screenshot) > 256_000:
+            return await asyncio.to_thread(
+                lambda b: b2a_base64(b, newline=False).decode('ascii'), screenshot)
+        return b2a_base64(screenshot, newline=False).decode('ascii')
 
     @filter.on_llm_request()
     async def on_llm_request(self, event: AstrMessageEvent, req: ProviderRequest):
         """注入上下文"""
         if not self.enable_plugin: return
-        urls = self.url_pattern.findall(event.message_str)
+        # 绝大多数消息不含链接，先用 C 级 substring 检查挡掉，不进正则引擎
+        if 'http' not in event.message_str: return
+        # 按缓存键去重：同一文章带不同跟踪参数只抓取、注入一次（保留首个原始 URL）
+        seen: Dict[str, str] = {}
+        for u in self.url_pattern.findall(event.message_str):
+            seen.setdefault(_canonicalize_url(u), u)
+        urls = list(seen.values())[:_MAX_URLS_PER_MSG]
         if not urls: return
-        
-        target_url = urls[0]
-        content, screenshot_base64 = await self._fetch_url_content(target_url)
-        if content:
-            req.prompt += self.prompt_template.format(content=content)
-            if screenshot_base64:
+
+        # 多链接并发抓取，整体耗时取决于最慢的一条而非总和
+        results = await asyncio.gather(*(self._fetch_url_content(u) for u in urls), return_exceptions=True)
+        contents = []
+        screenshot = None
+        for res in results:
+            if isinstance(res, BaseException):
+                logger.error(f"[LinkReader] 链接解析异常: {res}")
+                continue
+            content, shot = res
+            if content:
+                contents.append(content)
+            if shot and screenshot is None:
+                screenshot = shot
+
+        if contents or screenshot:
+            injected = "\n\n".join(contents) if contents else "（正文提取失败，请参考附带的页面截图回答）"
+            req.prompt += self.prompt_template.format(content=injected)
+            if screenshot:
+                # 仅在注入时才做 base64 编码，缓存与抓取链路保持原始 bytes
+                screenshot_base64 = await self._encode_screenshot(screenshot)
                 req.prompt += f"\n(附带页面截图)\n图片：data:image/jpeg;base64,{screenshot_base64}"
 
     @filter.command("link_debug")
@@ -271,12 +701,15 @@ class LinkReaderPlugin(Star):
     @filter.command("link_status")
     async def link_status(self, event: AstrMessageEvent):
         """状态检查 - 重新加入社交平台显示"""
-        msg = [
-            "【Link Reader 1.7.1 状态报告】",
-            "网易云解析: ✅ (ID直连 + 搜索兜底)",
-            "社交平台截图: ✅ (小红书/知乎/微博/B站/抖音/Lofter)",
-            "智能搜索源: xiaojiangclub.com ✅",
-            f"截图引擎 (Playwright): {'✅ 已加载' if HAS_PLAYWRIGHT else '❌ 未就绪'}",
-            f"内容截断长度: {self.max_length} 字"
-        ]
-        yield event.plain_result("\n".join(msg))
+        if self._status_cache is None:
+            msg = [
+                "【Link Reader 1.7.1 状态报告】",
+                "网易云解析: ✅ (ID直连 + 搜索兜底)",
+                "社交平台截图: ✅ (小红书/知乎/微博/B站/抖音/Lofter)",
+                "智能搜索源: xiaojiangclub.com ✅",
+                f"截图引擎 (Playwright): {'✅ 已加载' if HAS_PLAYWRIGHT else '❌ 未就绪'}",
+                f"内容截断长度: {self.max_length} 字"
+            ]
+            self._status_cache = "\n".join(msg)
+        cache_line = f"\n解析缓存: 命中 {self._cache_hits} / 未命中 {self._cache_misses}"
+        yield event.plain_result(self._status_cache + cache_line)